@@ -23,6 +23,7 @@ import wikitextparser as wtp
 import re
 import sys
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from wikxtract import WiktiDs
 
 
@@ -84,38 +85,58 @@ Wortverbindung
 """
 
 
-# Section descriptor
-SECTION_DATA = namedtuple('SECTION_DATA', ['level', 'header', 'body'])
+class SECTION_DATA(namedtuple('SECTION_DATA', ['level', 'header', 'wikitext', 'body_start', 'body_end'])):
+    """Section descriptor
+
+    The section body is given by its offsets in the whole wikitext
+    and it is sliced only when requested.
+    The body property is public API for the users of wiki_sections_factory,
+    the parser itself works on the offsets.
+    """
+    __slots__ = ()
+
+    @property
+    def body(self):
+        return self.wikitext[self.body_start:self.body_end]
+
+
+# Precompiled regular expressions:
+# calling the pattern methods directly skips the `re` module cache lookup
+# that `re.match(pattern_string, ...)` performs on every call.
+_RE_HEAD = re.compile(r'==\s*(\w+) \({{Sprache\|Deutsch}}\).*')
+_RE_MIDDLE = re.compile(r".*?(?:{{Wortart\|([\w\s]+)\|Deutsch}})(?:, {{([fmn]+)}})?(?:, {{Wortart\|([\w\s]+)\|Deutsch}})?.*")
+_RE_TRANS = re.compile(r"\*{{(\w+)}}: {{Ü\|\w+\|(\w+)}}(?: {{(\w+)}})?")
+_RE_LIST_ITEM = re.compile(r"([\w\s\.]+)'''\[\[(\w+)\]\]'''")
+_RE_TEMPLATE = re.compile(r'Deutsch (\w+) Übersicht.*')
+_RE_PRONOUN_TEMPLATE = re.compile(r'Pronomina-Tabelle.*')
+# Heading title of either the root word (level 2) or the category (level 3)
+_HEADER_COMBINED = re.compile(r'(?:\s*(?P<root>\w+) \({{Sprache\|Deutsch}}\).*)|(?:\s* {{Wortart\|(?P<cat>[\w\s]+)\|Deutsch}}.*)')
+# A whole heading line: the opening `=` sequence (group 1) sets the level,
+# group 2 is the heading title as returned by WikiTextParser.
+_HEADER_SCAN = re.compile(r'^(={2,6})(.*?)\1\s*$', re.MULTILINE)
+# A sequence of two or more `=` (group 1), followed by any characters
+# until the next sequence of `=` characters.
+_HEADER_RE = re.compile(r'(={2,})[^=]*=*')
+
+# Languages of the translations kept by Wiktionary.category_desc
+_TRANSLATION_LANGS = frozenset({'en', 'fr', 'it', 'sp'})
 
 
 def wiki_headers_factory(string):
-    """Iterate through the wikitext string in pure python
+    """Iterate through the wikitext string
     to find patterns that match r'(==+.*?==+)' then return
     the tuple (header_start_position, header_end_position, level) one at a time.
 
     It looks for sequences of == characters, followed by any characters
     until another sequence of == characters is found.
-    Then collects these matches as an iterable object.
+    The scan is done by the C regex engine through re.finditer(),
+    then these matches are collected as an iterable object.
 
     Understand iterables and generators:
     https://stackoverflow.com/a/231855
     """
-    cursor = 0
-    while cursor < len(string):
-        if string[cursor] == '=' and cursor + 1 < len(string) and string[cursor + 1] == '=':
-            start = cursor
-            level = 0
-            while cursor < len(string) and string[cursor] == '=':
-                cursor += 1
-                level += 1
-            while cursor < len(string) and string[cursor] != '=':
-                cursor += 1
-            while cursor < len(string) and string[cursor] == '=':
-                cursor += 1
-            end = cursor
-            yield (start, end, level)
-        else:
-            cursor += 1
+    for match in _HEADER_RE.finditer(string):
+        yield (match.start(), match.end(), len(match.group(1)))
 
 
 def wiki_sections_factory(wikitext):
@@ -139,11 +160,77 @@ def wiki_sections_factory(wikitext):
             # merge sections with eheader level 5 or more
             # in the current section
             continue
-        yield SECTION_DATA(current_level, current_header, wikitext[body_start:next_match[0]])
+        yield SECTION_DATA(current_level, current_header, wikitext, body_start, next_match[0])
         current_level = next_match[2]
         current_header = next_header
         body_start = next_match[1]
-    yield SECTION_DATA(current_level, current_header, wikitext[body_start:])
+    yield SECTION_DATA(current_level, current_header, wikitext, body_start, len(wikitext))
+
+
+def wiki_headers_only(wikitext):
+    """Iterate through the heading lines of wikitext
+    returning the tuple (level, header_title) one at a time.
+
+    Unlike wiki_sections_factory, nothing but the heading titles
+    is taken from the wikitext.
+    """
+    for match in _HEADER_SCAN.finditer(wikitext):
+        yield (len(match.group(1)), match.group(2))
+
+
+def fast_get_header(wikitext):
+    """Return the root word and the first category of the wikitext
+    scanning its level 2 and 3 headings only.
+
+    Same result as Wiktionary.get_header, without building
+    the whole WikiTextParser tree of the page.
+    """
+    root_word = ''
+    category = ''
+    for level, title in wiki_headers_only(wikitext):
+        if level not in (2, 3):
+            continue
+        header_match = _HEADER_COMBINED.match(title)
+        if header_match:
+            if header_match.group('root'):
+                if len(root_word) == 0:
+                    root_word = header_match.group('root')
+            elif len(category) == 0:
+                category = header_match.group('cat')
+        if root_word and category:
+            break
+    return root_word, category
+
+
+# Local Data Store of a get_category_list() worker process
+_worker_ds = None
+
+
+def _init_category_worker():
+    """Open the local Data Store once in each worker process"""
+    global _worker_ds
+    _worker_ds = WiktiDs()
+
+
+def _parse_one(index_item):
+    """Return the category of the term in the (term, line_number) index item,
+    or an empty string if not found.
+    """
+    term, line_number = index_item
+    wikitext_start, wikitext_end = _worker_ds.find_wikitext_in_ds(term, line_number)
+    # The category is usually in the first level 3 heading:
+    # decode the wikitext up to the end of that heading line only,
+    # and the whole wikitext if the category is not found there.
+    heading_end = _worker_ds.find_first_heading_in_ds(wikitext_start, wikitext_end)
+    if heading_end >= 0:
+        _, category = fast_get_header(_worker_ds.decode_ds(wikitext_start, heading_end))
+        if category:
+            return category
+    wikitext = _worker_ds.decode_ds(wikitext_start, wikitext_end)
+    if not wikitext:
+        return ''
+    _, category = fast_get_header(wikitext)
+    return category
 
 
 class Wiktionary:
@@ -154,16 +241,16 @@ class Wiktionary:
     """
     TEMPLATE_PATTERNS_TABLE = {
         # Category            template name regex 
-        'Verb'              : r'Deutsch (\w+) Übersicht.*',
-        'Adjektiv'          : r'Deutsch (\w+) Übersicht.*',
-        'Indefinitpronomen' : r'Deutsch (\w+) Übersicht.*',
-        'Artikel'           : r'Pronomina-Tabelle.*',
-        'Substantiv'        : r'Deutsch (\w+) Übersicht.*'
+        'Verb'              : _RE_TEMPLATE,
+        'Adjektiv'          : _RE_TEMPLATE,
+        'Indefinitpronomen' : _RE_TEMPLATE,
+        'Artikel'           : _RE_PRONOUN_TEMPLATE,
+        'Substantiv'        : _RE_TEMPLATE
     }
     LIST_ITEM_PATTERNS_TABLE = {
         # Category            list item regex 
-        'Konjugierte Form'  : r"([\w\s\.]+)'''\[\[(\w+)\]\]'''",
-        'Deklinierte Form'  : r"([\w\s\.]+)'''\[\[(\w+)\]\]'''"
+        'Konjugierte Form'  : _RE_LIST_ITEM,
+        'Deklinierte Form'  : _RE_LIST_ITEM
     }
     LEMMA_CLASS = namedtuple('LEMMA_CLASS', ['type', 'defs'])
     LEMMA_DESC = namedtuple('LEMMA_DESC', ['term', 'wikitext', 'lemma_root', 'lemma_categories'])
@@ -175,43 +262,42 @@ class Wiktionary:
 
         def __init__(self, name):
             self.name = name
-            self.inflection_table = ()
-            self.translations = ()
+            self.inflection_table = []
+            self.translations = []
         
         def append_inflection_table(self, inflection_item):
             # TODO filter inflection items
-            self.inflection_table += (inflection_item,)
+            self.inflection_table.append(inflection_item)
 
         def append_translation(self, translation_item):
-            if translation_item.lang in ('en', 'fr', 'it', 'sp'):
-                self.translations += (translation_item,)
+            if translation_item.lang in _TRANSLATION_LANGS:
+                self.translations.append(translation_item)
             # ignore othe languages
 
     def __init__(self, online=False):
         self.ds = WiktiDs(online)
 
     def get_category_list(self):
-        category_list = []
-        with open(self.ds.wiktionary_index_path, 'r', encoding='utf-8') as index_file:
+        """Return the categories found in the local Data Store.
+
+        The local Data Store index entries are parsed in parallel
+        by a pool of worker processes, one per CPU.
+        """
+        # a dict keeps the categories in first-seen order, as the list did
+        categories = {}
+        with ProcessPoolExecutor(initializer=_init_category_worker) as executor:
             linen = 0
-            for line in index_file:
+            # a large chunksize amortizes the inter-process communication cost
+            for category in executor.map(_parse_one, self.ds.wikti_index.items(), chunksize=2048):
                 if linen % 5000 == 0:
                     # Use sys.stdout.write() instead of print()
                     # as a workaround to fix '\r' display in VS Code terminal
                     sys.stdout.write(f'Parsed {linen} lines\r')
                 linen += 1
-
-                term, line_number = line.rstrip().split(',')
-                line_number = int(line_number)
-                wikitext = self.ds.fetch_wikitext_from_ds(term, line_number)
-                if wikitext:
-                    wikitext_parsed = wtp.parse(wikitext)
-                    root_word, category = self.get_header(wikitext_parsed)
-                    if len(category) > 0:
-                        if category not in category_list:
-                            category_list.append(category)
+                if len(category) > 0:
+                    categories[category] = None
         print(f'Parsed {linen} lines')
-        return category_list
+        return list(categories)
 
     def parse_head(self, section):
         """Parse lemma section HEAD
@@ -222,48 +308,71 @@ class Wiktionary:
         if section.level != 2:
             return None
         # check that the lemma belongs to the German language
-        match = re.match(r'==\s*(\w+) \({{Sprache\|Deutsch}}\).*', section.header)
+        match = _RE_HEAD.match(section.header)
         if not match:
             return None
         return match.group(1)
 
-    def parse_middle(self, section):
-        middle_header_pattern = r".*?(?:{{Wortart\|([\w\s]+)\|Deutsch}})(?:, {{([fmn]+)}})?(?:, {{Wortart\|([\w\s]+)\|Deutsch}})?.*"
-        match_list = re.findall(middle_header_pattern, section.header)
+    def parse_middle(self, section, templates, lists):
+        """Parse lemma MIDDLE section
+        returning its category description.
+
+        templates and lists come from the WikiTextParser tree of the whole
+        wikitext: only the ones inside the section body are parsed.
+        """
+        match_list = _RE_MIDDLE.findall(section.header)
         if not match_list:
             return None
         # findall returns all non-overlapping matches
         # of the pattern in section header as a list of tuples.
         category = self.category_desc(', '.join(match_list[0]))  # the name
-        wikitext_parsed = wtp.parse(section.body)
+        body_start = section.body_start
+        body_end = section.body_end
+        # Bind the callables used in the loops below to local names.
+        # namedtuple _make() builds an item from a tuple faster
+        # than calling the class with positional arguments.
+        make_inflection = Wiktionary.INFLECTION_ITEM._make
+        append_inflection = category.append_inflection_table
         # Parse templates
-        for template in wikitext_parsed.templates:
-            match  = re.match(r'Deutsch (\w+) Übersicht.*', template.name)
+        for template in templates:
+            start, end = template.span
+            if start < body_start or end > body_end:
+                continue
+            name = template.name
+            # cheap string tests skip most templates before the regex
+            if not name.startswith('Deutsch ') or 'Übersicht' not in name:
+                continue
+            match  = _RE_TEMPLATE.match(name)
             if match:
-                for argc in range(len(template.arguments)):
-                    argv = template.arguments[argc]
-                    category.append_inflection_table(Wiktionary.INFLECTION_ITEM(argv.name, argv.value.rstrip()))
+                for argv in template.arguments:
+                    append_inflection(make_inflection((argv.name, argv.value.rstrip())))
         # Parse lists
-        for wikilist in wikitext_parsed.get_lists(pattern=r'\*'):
+        match_list_item = _RE_LIST_ITEM.match
+        for wikilist in lists:
+            start, end = wikilist.span
+            if start < body_start or end > body_end:
+                continue
             for list_item in wikilist.items:
-                match  = re.match(r"([\w\s\.]+)'''\[\[(\w+)\]\]'''", list_item)
+                match  = match_list_item(list_item)
                 if match:
-                    category.append_inflection_table(Wiktionary.INFLECTION_ITEM(match[1], match[2]))
+                    append_inflection(make_inflection(match.group(1, 2)))
         return category
 
     def parse_translation(self, category, section):
         if section.header != '==== {{Übersetzungen}} ====':
             return
-        pattern = r"\*{{(\w+)}}: {{Ü\|\w+\|(\w+)}}(?: {{(\w+)}})?"
-        match_list = re.findall(pattern, section.body)
+        # search the section body in place, without slicing it
+        match_list = _RE_TRANS.findall(section.wikitext, section.body_start, section.body_end)
         if match_list:
+            make_translation = Wiktionary.TRANSLATION_ITEM._make
+            append_translation = category.append_translation
             for match in match_list:
-                category.append_translation(Wiktionary.TRANSLATION_ITEM(match[0], ', '.join(match[1:])))
+                append_translation(make_translation((match[0], ', '.join(match[1:]))))
             
     def query(self, search_word):
         """Search for a word and return its lemma description"""
         lemma_root = ''
-        categories = ()
+        categories = []
         word_wikitext = self.ds.get_wikitext(search_word)
         if word_wikitext:
             # split wikitext in lemma description sections
@@ -271,17 +380,22 @@ class Wiktionary:
             # the first section of a lemma description must be the HEAD
             lemma_root = self.parse_head(sections.__next__())
             if lemma_root:
+                # parse the whole wikitext once,
+                # then each section takes its own templates and lists
+                wikitext_parsed = wtp.parse(word_wikitext)
+                templates = wikitext_parsed.templates
+                lists = wikitext_parsed.get_lists(pattern=r'\*')
                 # parse next sections
                 for section in sections:
                     if section.level == 3:
-                        category = self.parse_middle(section)
+                        category = self.parse_middle(section, templates, lists)
                         if category:
-                            categories += (category,)
+                            categories.append(category)
                     elif section.level == 4:
                         current_category = len(categories) - 1
                         if current_category >= 0:
                             self.parse_translation(categories[current_category], section)
-        return Wiktionary.LEMMA_DESC(search_word, word_wikitext, lemma_root, categories)
+        return Wiktionary.LEMMA_DESC(search_word, word_wikitext, lemma_root, tuple(categories))
 
     def query_old(self, term):
         root_word = ''
@@ -313,42 +427,49 @@ class Wiktionary:
         category = ''
         headings = wikitext_parsed.sections
         for heading in headings:
-            if heading.level == 2:
-                if len(root_word) == 0:
-                    match = re.match(r'\s*(\w+) \({{Sprache\|Deutsch}}\).*', heading.title)
-                    if match:
-                        root_word = match.group(1)
-            elif heading.level == 3:
-                if len(category) == 0:
-                    match = re.match(r'\s* {{Wortart\|([\w\s]+)\|Deutsch}}.*', heading.title)
-                    if match:
-                        category = match.group(1)
+            if heading.level not in (2, 3):
+                # only level 2 and 3 headings matter
+                continue
+            # a single regex run matches either the root word or the category
+            match = _HEADER_COMBINED.match(heading.title)
+            if match:
+                if match.group('root'):
+                    if len(root_word) == 0:
+                        root_word = match.group('root')
+                elif len(category) == 0:
+                    category = match.group('cat')
+            if root_word and category:
+                break
         return root_word, category
 
     def wiki_template_2_list(self, templates, pattern):
         """Convert WikiTextParser template arguments into Python list
+
+        pattern is the compiled regex matching the template name.
+        Only the arguments of the first matching template are converted.
         """
-        inflection_list = ()
-        for template in templates:
-            template_inflection_type = template.name
-            match  = re.match(pattern, template_inflection_type)
-            if match:
-                for argc in range(len(template.arguments)):
-                    argv = template.arguments[argc]
-                    inflection_list = inflection_list + (Wiktionary.INFLECTION_ITEM(argv.name, argv.value.rstrip()),)
-                break
-        return inflection_list
+        match_name = pattern.match
+        template = next((t for t in templates if match_name(t.name)), None)
+        if template is None:
+            return ()
+        make_inflection = Wiktionary.INFLECTION_ITEM._make
+        return tuple(make_inflection((argv.name, argv.value.rstrip())) for argv in template.arguments)
 
     def wiki_list_2_list(self, lists, pattern):
         """Convert WikiTextParser list into Python list
+
+        pattern is the compiled regex matching the list items.
         """
-        inflection_list = ()
+        inflection_list = []
+        append_inflection = inflection_list.append
+        make_inflection = Wiktionary.INFLECTION_ITEM._make
+        match_list_item = pattern.match
         for wikilist in lists:
             for list_item in wikilist.items:
-                match  = re.match(pattern, list_item)
+                match  = match_list_item(list_item)
                 if match:
-                    inflection_list = inflection_list + (Wiktionary.INFLECTION_ITEM(match[1], match[2]),)
-        return inflection_list
+                    append_inflection(make_inflection(match.group(1, 2)))
+        return tuple(inflection_list)
 
 
 if __name__ == '__main__':
@@ -2,14 +2,21 @@
 """Query German Wiktionary
 """
 import os
+from collections import OrderedDict
 from wikparse import Wiktionary
 
 
+# Directory of this script, where the wikitext files are stored
+_SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+
+# Max number of parsed entries kept by the query loop
+ENTRIES_CACHE_SIZE = 1024
+
+
 def dump_wikitext(wiktentry):
     """Store WikiText to a file whose name is wikitext_<search_term>.txt
     """
-    script_full_path = os.path.realpath(__file__)
-    wikitext_file_path = os.path.join(os.path.dirname(script_full_path), f'wikitext_{wiktentry.term}.txt')
+    wikitext_file_path = os.path.join(_SCRIPT_DIR, f'wikitext_{wiktentry.term}.txt')
     with open(wikitext_file_path, 'w', encoding="utf-8") as wikitext_file:
         wikitext_file.write(wiktentry.wikitext)
     return wikitext_file_path
@@ -39,13 +46,23 @@ def show(wiktentry):
 if __name__ == '__main__':
     print('Wiktionary query')
     wiki = Wiktionary()
+    # parsed entries of the most recently searched terms,
+    # the least recently searched first
+    entries = OrderedDict()
     while True:
         try:
             user_input = input('\nTerm: ')
         except KeyboardInterrupt:
             print()
             break
-        entry = wiki.query(user_input)
+        entry = entries.get(user_input)
+        if entry is None:
+            entry = wiki.query(user_input)
+            entries[user_input] = entry
+            if len(entries) > ENTRIES_CACHE_SIZE:
+                entries.popitem(last=False)
+        else:
+            entries.move_to_end(user_input)
         show(entry)
         if entry.wikitext and len(entry.lemma_categories) == 0:
             print(f'WikiText for "{user_input}" exists but not successful parsed.')
@@ -84,11 +84,19 @@ Action API Main page: https://www.mediawiki.org/wiki/API:Main_page
 API Tutorial: https://www.mediawiki.org/wiki/API:Tutorial
 German Wiktionary API Help page: https://de.wiktionary.org/w/api.php
 """
+import bz2
+import functools
+import lzma
+import mmap
 import os
 import re
+import shutil
 import sys
+import weakref
 import requests
-from time import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from time import sleep, time
 
 
 # MediaWiki German Wiktionary dump
@@ -100,130 +108,350 @@ WIKTIONARY_PAGES_DUMP = r'ds\dewiktionary-20240701-pages-articles.xml'  # 58.226
 #   to match the exact string "{{Sprache|Deutsch}}".
 WIKITEXT_LEMMA_HEAD_TEMPLATE = r'== {} \({{{{Sprache\|Deutsch}}}}\) =='
 
+# Same lemma head as plain text, to be searched by str methods:
+# the format() placeholder `{}` is replaced by the lemma
+# and `{{{{` and `}}}}` are format() escaping of "{{" and "}}".
+WIKITEXT_LEMMA_HEAD = '== {} ({{{{Sprache|Deutsch}}}}) =='
+
+# Lemma head pattern, compiled once for the local Data Store index build:
+# `[\w]+` matches the lemma whose definition follows its section heading.
+# The parentheses () around [\w]+ create a matching group.
+_LEMMA_HEAD_RE = re.compile(WIKITEXT_LEMMA_HEAD_TEMPLATE.format(r'([\w]+)'))
+# Literal part of any lemma head, as UTF-8 bytes:
+# only the dump lines containing it are decoded and searched by _LEMMA_HEAD_RE.
+_LEMMA_HEAD_NEEDLE = b'({{Sprache|Deutsch}})'
+_LEMMA_HEAD_NEEDLE_RE = re.compile(re.escape(_LEMMA_HEAD_NEEDLE))
+
+# Compressed dumps as downloaded from https://dumps.wikimedia.org,
+# each extension with the function opening it
+COMPRESSED_DUMP_OPENERS = (('.bz2', bz2.open), ('.xz', lzma.open))
+
+# Size of the dump chunks scanned in parallel while building the index
+INDEX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Max number of wikitext pages kept in memory by WiktiDs.get_wikitext()
+WIKITEXT_CACHE_SIZE = 512
+
+# Seconds to wait for the MediaWiki API server
+WEB_REQUEST_TIMEOUT = 10
+# Max number of times a request is sent again when the server asks to retry later
+WEB_REQUEST_MAX_RETRIES = 3
+
+# Action API parse request claiming output data in JSON format:
+# the page to parse is appended to these parameters by each search.
+_PARSE_BASE_PARAMS = (
+    ("action", "parse"),
+    ("prop", "wikitext"),
+    ("format", "json"),
+    ("formatversion", "2"),  # modern JSON format
+)
+
+
+def extract_pages_dump(file_name):
+    """Decompress the Wiktionary pages dump file_name
+    from file_name.bz2 or file_name.xz, whichever is found.
+
+    The dump is decompressed once as a stream to a temporary file,
+    renamed to file_name when complete:
+    the index and the wikitext lookups need random access to the plain dump.
+    """
+    for extension, open_compressed in COMPRESSED_DUMP_OPENERS:
+        compressed_file_name = file_name + extension
+        if not os.path.exists(compressed_file_name):
+            continue
+        print(f'Extracting {compressed_file_name}')
+        time_start = time()
+        partial_file_name = file_name + '.part'
+        with open_compressed(compressed_file_name, 'rb') as compressed_file, \
+                open(partial_file_name, 'wb') as file:
+            shutil.copyfileobj(compressed_file, file, 1024 * 1024)
+        os.replace(partial_file_name, file_name)
+        time_elapsed = time() - time_start
+        print(f'Extracted {file_name} in {time_elapsed} s')
+        return
+
+
+def _lru_cached_method(method, maxsize):
+    """Return method wrapped by functools.lru_cache,
+    holding only a weak reference to its instance.
+
+    Storing the cached bound method on the instance itself does not create
+    a reference cycle, so the instance is freed (and __del__ called)
+    as soon as it is no longer used.
+    """
+    method_ref = weakref.WeakMethod(method)
+
+    @functools.lru_cache(maxsize=maxsize)
+    def cached_method(*args):
+        return method_ref()(*args)
+    return cached_method
+
+
+def _scan_lemma_heads(file_name, start, end):
+    """Return the list of (lemma, offset) of the lines containing a lemma head
+    between the offsets start and end of file_name, both aligned to a line start.
+
+    Run by the make_ds_index() worker processes, each one mapping the file on its own.
+    """
+    lemma_heads = []
+    # Memory map the input file and let the regex engine scan it
+    # for the literal part of lemma heads, instead of iterating its lines in Python.
+    # Offsets are positions in the mapped bytes, line endings included.
+    with open(file_name, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            # madvise() is not available on Windows
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        line_end = start
+        for needle in _LEMMA_HEAD_NEEDLE_RE.finditer(mm, start, end):
+            if needle.start() < line_end:
+                # this line is already indexed
+                continue
+            line_start = mm.rfind(b'\n', 0, needle.start()) + 1
+            line_end = mm.find(b'\n', needle.end(), end)
+            if line_end < 0:
+                line_end = end
+            # Search the wikitext page title in the current line.
+            # The line is decoded because a bytes regex `\w` matches ASCII letters only.
+            match = _LEMMA_HEAD_RE.search(mm[line_start:line_end].decode('utf-8'))
+            if match:
+                lemma_heads.append((match.group(1), line_start))
+    return lemma_heads
+
+
+class WiktiIndex:
+    """Index of the local Data Store:
+    one `lemma<TAB>offset` line for each lemma, sorted by lemma.
+
+    Lookups are binary searches on the lines of the memory mapped index file,
+    so the index is not loaded in memory and a search only reads the pages it probes.
+    """
+
+    def __init__(self, records=b''):
+        # index file content, as bytes or memory map
+        if records and records[-1:] != b'\n':
+            # the binary search relies on every line ending with a newline
+            raise ValueError('Truncated index: delete the index file to make it again')
+        self.records = records
+
+    def get(self, lemma, default=None):
+        """Return the offset of lemma, default if lemma is not in the index"""
+        # UTF-8 encoding keeps the order of code points,
+        # so the lemmas encoded in bytes are still sorted.
+        key = lemma.encode('utf-8')
+        records = self.records
+        # low and high are always at the start of a line
+        low, high = 0, len(records)
+        while low < high:
+            middle = (low + high) // 2
+            line_start = max(records.rfind(b'\n', low, middle) + 1, low)
+            tab = records.find(b'\t', line_start)
+            line_end = records.find(b'\n', tab)
+            line_lemma = records[line_start:tab]
+            if key < line_lemma:
+                high = line_start
+            elif key > line_lemma:
+                low = line_end + 1
+            else:
+                return int(records[tab + 1:line_end])
+        return default
+
+    def items(self):
+        """Iterate over (lemma, offset) pairs in lemma order"""
+        records = self.records
+        line_start = 0
+        while line_start < len(records):
+            line_end = records.find(b'\n', line_start)
+            lemma, offset = records[line_start:line_end].split(b'\t')
+            yield lemma.decode('utf-8'), int(offset)
+            line_start = line_end + 1
+
+    def __iter__(self):
+        for lemma, offset in self.items():
+            yield lemma
+
+    def __reversed__(self):
+        records = self.records
+        line_end = len(records) - 1
+        while line_end >= 0:
+            line_start = records.rfind(b'\n', 0, line_end) + 1
+            yield records[line_start:records.find(b'\t', line_start)].decode('utf-8')
+            line_end = line_start - 1
+
 
 class WiktiDs:
     """Wiktionary Data Store"""
     # MediaWiki German Wiktionary API Endpoint
     WIKTI_API_URL = "https://de.wiktionary.org/w/api.php"
+    # Max number of titles of a single Action API query
+    WIKTI_API_MAX_TITLES = 50
 
     def __init__(self, online=False):
         self.wikti_pages = None
-        self.wikti_pages_idx = None
-        self.wikti_pages_cache = {}
+        self.wikti_pages_map = None
+        self.wikti_index_map = None
+        self.wikti_index = WiktiIndex()
+        self._session = None
+        # get_wikitext() caches the most recently searched words
         if online:
-            self.get_wikitext = self.get_wikitext_from_web
+            self.get_wikitext = _lru_cached_method(self.get_wikitext_from_web, WIKITEXT_CACHE_SIZE)
             self.wikti_pages_articles_path = ''
             self.wiktionary_index_path = ''
             return
-        self.get_wikitext = self.get_wikitext_from_ds
+        self.get_wikitext = _lru_cached_method(self.get_wikitext_from_ds, WIKITEXT_CACHE_SIZE)
         script_full_path = os.path.realpath(__file__)
         self.wikti_pages_articles_path = os.path.join(os.path.dirname(script_full_path), WIKTIONARY_PAGES_DUMP)
         wiktionary_basename, wiktionary_ext = os.path.splitext(self.wikti_pages_articles_path)
-        self.wiktionary_index_path = wiktionary_basename + '-index.csv'
+        self.wiktionary_index_path = wiktionary_basename + '-index.tsv'
+        if not os.path.exists(self.wikti_pages_articles_path):
+            # only the compressed dump may have been downloaded
+            extract_pages_dump(self.wikti_pages_articles_path)
         try:
-            self.wikti_pages_idx = open(self.wiktionary_index_path, 'r', encoding='utf-8')
+            self.load_ds_index(self.wiktionary_index_path)
         except FileNotFoundError:
             print('Index file not found')
             self.make_ds_index(self.wikti_pages_articles_path, self.wiktionary_index_path)
-            # Try again to open index file
-            self.wikti_pages_idx = open(self.wiktionary_index_path, 'r', encoding='utf-8')
-        self.wikti_pages = open(self.wikti_pages_articles_path, 'r', encoding='utf-8')
+        # Memory map the local Data Store:
+        # the wikitext of a lemma is then sliced out of the mapped bytes.
+        self.wikti_pages = open(self.wikti_pages_articles_path, 'rb')
+        self.wikti_pages_map = mmap.mmap(self.wikti_pages.fileno(), 0, access=mmap.ACCESS_READ)
 
     def __del__(self):
         # print('Delete WiktiDs class')
+        if self.wikti_index_map is not None:
+            self.wikti_index_map.close()
+        if self.wikti_pages_map is not None:
+            self.wikti_pages_map.close()
         if self.wikti_pages is not None:
             self.wikti_pages.close()
-        if self.wikti_pages_idx is not None:
-            self.wikti_pages_idx.close()
+        if self._session is not None:
+            self._session.close()
+
+    @property
+    def session(self):
+        """HTTP session shared by the online searches, created by the first one
+        in either online or offline mode.
+
+        Its connection pool keeps the TLS connection to the API server alive
+        instead of opening a new one for each request.
+        """
+        if self._session is None:
+            self._session = requests.Session()
+            self._session.headers.update({"User-Agent": "yawe/1.0"})
+        return self._session
+
+    def load_ds_index(self, index_file_name):
+        """Memory map the index file
+        mapping each lemma to its offset in the local Data Store.
+        """
+        with open(index_file_name, 'rb') as index_file:
+            if os.fstat(index_file.fileno()).st_size == 0:
+                # an empty file cannot be memory mapped
+                self.wikti_index = WiktiIndex()
+                return
+            self.wikti_index_map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.wikti_index = WiktiIndex(self.wikti_index_map)
 
     def make_ds_index(self, file_name, index_file_name):
-        """Parsed 58226026 lines in 38.40424108505249 s"""
-        # Define the lemma head pattern:
-        # - `[\w]+` matches the lemma whose definition follows its section heading.
-        #   The parentheses () around [\w]+ create a matching group.
-        # - `.*`: Matches any character (except for line terminators) zero or more times.
-        #   This part of the pattern will match everything before and after the specific patterns.
-        lemma_head_pattern = '.*' + WIKITEXT_LEMMA_HEAD_TEMPLATE.format(r'([\w]+)') + '.*'
+        """Write to index_file_name the offset in bytes
+        of each line of file_name containing a lemma head,
+        and make it the index of the local Data Store.
+
+        The index is a text file with a `lemma<TAB>offset` line for each lemma,
+        sorted by lemma to be binary searched by WiktiIndex.
+
+        Reading the dump line by line:
+        Parsed 58226026 lines in 38.40424108505249 s
+        """
         print(f'Making index file: {index_file_name}')
-        # Check line ending size of input file:
-        # computing the offset of a line in a text file,
-        # the size of line ending matters because readline()
-        # converts it to one only character ('\n') for any Operating System.
-        line_ending_extra_sz = 0
-        with open(file_name, 'rb') as file:
-            # Open file as binary to avoid line ending conversion
-            for line in file:
-                if b'\r\n' in line:
-                    # Windows text file line ending
-                    # else '\n' (unix) or '\r' (mac)
-                    line_ending_extra_sz = 1
-                break
-        # Parse input file and create its index
         time_start = time()
-        with open(file_name, 'r', encoding='utf-8') as file, \
-                open(index_file_name, 'w', encoding='utf-8') as index_file:
-            offset = 0
-            linen = 0
-            for line in file:
-                if linen % 500000 == 0:
-                    # Use sys.stdout.write() instead of print()
-                    # as a workaround to fix '\r' display in VS Code terminal
-                    sys.stdout.write(f'Parsed {linen} lines\r')
-                linen += 1
-                # Search the wikitext page title in the current line
-                match = re.match(lemma_head_pattern, line)
-                if match:
-                    # append the offset to the index
-                    index_file.writelines(f'{match.group(1)},{offset}\n')
-                offset += len(line.encode('utf-8')) + line_ending_extra_sz
+        # Split the input file in chunks of about INDEX_CHUNK_SIZE bytes
+        # ending at a line end, so that no line spans two chunks.
+        with open(file_name, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            file_size = len(mm)
+            chunk_bounds = [0]
+            while chunk_bounds[-1] < file_size:
+                chunk_end = mm.find(b'\n', chunk_bounds[-1] + INDEX_CHUNK_SIZE)
+                chunk_bounds.append(file_size if chunk_end < 0 else chunk_end + 1)
+        # Scan the chunks in parallel by a pool of worker processes, one per CPU,
+        # then merge their lemma heads in file order.
+        index = {}
+        with ProcessPoolExecutor() as executor:
+            chunks_lemma_heads = executor.map(_scan_lemma_heads, repeat(file_name), chunk_bounds[:-1], chunk_bounds[1:])
+            for chunk_end, lemma_heads in zip(chunk_bounds[1:], chunks_lemma_heads):
+                # Use sys.stdout.write() instead of print()
+                # as a workaround to fix '\r' display in VS Code terminal
+                sys.stdout.write(f'Parsed {chunk_end // (1024 * 1024)} MB\r')
+                for lemma, offset in lemma_heads:
+                    # keep the first offset of a lemma as a sequential search would
+                    index.setdefault(lemma, offset)
+        # Write a temporary file renamed to index_file_name when complete,
+        # so that an interrupted write does not leave a truncated index.
+        partial_file_name = index_file_name + '.part'
+        with open(partial_file_name, 'w', encoding='utf-8', newline='\n') as index_file:
+            index_file.writelines(f'{lemma}\t{index[lemma]}\n' for lemma in sorted(index))
+        os.replace(partial_file_name, index_file_name)
+        self.load_ds_index(index_file_name)
         time_elapsed = time() - time_start
-        print(f'Parsed {linen} lines in {time_elapsed} s')
+        print(f'Parsed {file_size} bytes in {time_elapsed} s')
 
-    def fetch_wikitext_from_ds(self, lemma, line_number):
-        """Return Wikitext between the local Data Store line number
-        and the end of lemma definitions.
+    def find_wikitext_in_ds(self, lemma, line_number):
+        """Return the start and end offsets in the local Data Store
+        of the Wikitext between line number and the end of lemma definitions.
         """
-        # define the lemma title pattern
-        # removing regex '\' escape character.
-        lemma_head_pattern = WIKITEXT_LEMMA_HEAD_TEMPLATE.format(lemma).replace('\\', '')
+        # define the lemma title
+        lemma_head = WIKITEXT_LEMMA_HEAD.format(lemma).encode('utf-8')
 
         # Wikitext lemma definitions are found between <text>..</text> XML tags in the local Data Store.
         # line_number points to the line containing the lemma title inside <text>..</text> tags.
-        self.wikti_pages.seek(line_number)
-        first_section_line = self.wikti_pages.readline()
-        # Remove everything from the beginning of the first line to lemma title
-        section_line = re.sub(r'^.*?' + re.escape(lemma_head_pattern), lemma_head_pattern, first_section_line)
-        wikitext = ''
-        while True:
-            end_text_position = section_line.find('</text>')  # search the end of lemma definitions
-            if end_text_position > 0:
-                # found the end of lemma definitions
-                wikitext = wikitext + section_line[:end_text_position]
-                break
-            # else continue extracting
-            wikitext = wikitext + section_line
-            section_line = self.wikti_pages.readline()
+        # Remove everything from the beginning of the first line to lemma title,
+        # searched in that line only
+        line_end = self.wikti_pages_map.find(b'\n', line_number)
+        if line_end < 0:
+            line_end = len(self.wikti_pages_map)
+        wikitext_start = self.wikti_pages_map.find(lemma_head, line_number, line_end)
+        if wikitext_start < 0:
+            wikitext_start = line_number
+        # Search the end of lemma definitions in the mapped bytes at once
+        # instead of reading and searching the following lines one by one.
+        wikitext_end = self.wikti_pages_map.find(b'</text>', wikitext_start)
+        if wikitext_end < 0:
+            wikitext_end = len(self.wikti_pages_map)
+        return wikitext_start, wikitext_end
+
+    def find_first_heading_in_ds(self, start, end):
+        """Return the offset of the end of the first level 3 (or deeper) heading line
+        between the start and end offsets of the local Data Store, -1 if there is none.
+        """
+        heading = self.wikti_pages_map.find(b'\n===', start, end)
+        if heading < 0:
+            return -1
+        heading_end = self.wikti_pages_map.find(b'\n', heading + 1, end)
+        if heading_end < 0:
+            heading_end = end
+        return heading_end
+
+    def decode_ds(self, start, end):
+        """Return the text between the start and end offsets of the local Data Store"""
+        wikitext = self.wikti_pages_map[start:end].decode('utf-8')
+        if '\r' in wikitext:
+            # translate line endings as the text mode reading of the dump did
+            wikitext = wikitext.replace('\r\n', '\n').replace('\r', '\n')
         return wikitext
 
+    def fetch_wikitext_from_ds(self, lemma, line_number):
+        """Return Wikitext between the local Data Store line number
+        and the end of lemma definitions.
+        """
+        return self.decode_ds(*self.find_wikitext_in_ds(lemma, line_number))
+
     def get_wikitext_from_ds(self, search_word):
         """Search the given word in the local Data Store
         returning the corresponding Wikitext markup language.
         The search is case sensitive.
         """
-        line_number = -1
-        # First search the index cache
-        try:
-            line_number = self.wikti_pages_cache[search_word]
-        except KeyError:
-            # if not already in cache, search the index file
-            for line in self.wikti_pages_idx:
-                items = line.rstrip().split(',')
-                line_number = int(items[1])
-                # Add to the cache
-                self.wikti_pages_cache[items[0]] = line_number
-                if items[0] == search_word:
-                    break
-                line_number = -1
+        line_number = self.wikti_index.get(search_word, -1)
         if line_number < 0:
             # Not found
             return None
@@ -238,16 +466,8 @@ class WiktiDs:
 
         See: https://github.com/earwig/mwparserfromhell?tab=readme-ov-file#integration
         """
-        # Action API request claiming output data in JSON format
-        req_headers = {"User-Agent": "yawe/1.0"}
-        req_params = {
-            "action": "parse",
-            "prop": "wikitext",
-            "page": search_word,
-            "format": "json",
-            "formatversion": "2",  # modern JSON format
-        }
-        query_result = requests.get(WiktiDs.WIKTI_API_URL, headers=req_headers, params=req_params)
+        req_params = _PARSE_BASE_PARAMS + (("page", search_word),)
+        query_result = self.session.get(WiktiDs.WIKTI_API_URL, params=req_params, timeout=WEB_REQUEST_TIMEOUT)
         # Deserialize JSON data:
         response = query_result.json()
         # if the search word exists, Action API returns the following JSON data:
@@ -258,63 +478,168 @@ class WiktiDs:
         #         "wikitext": <wiki_markup>
         #     }
         # }
-        try:
-            wikitext = response["parse"]["wikitext"]
-        except:
-            # search word not found
-            return None
-        return wikitext
+        # otherwise it returns an error object instead of the parse one.
+        if "error" in response:
+            error = response["error"]
+            if error.get("code") == "missingtitle":
+                # search word not found
+                return None
+            # A temporary error (rate limit, lag, read-only...) is raised, not cached as not found
+            raise RuntimeError(f'MediaWiki API error {error.get("code")}: {error.get("info")}')
+        return response["parse"]["wikitext"]
+
+    def get_wikitexts_batch(self, search_words, concurrency=1):
+        """Search Wiktionary for the given words using MediaWiki Action API query module,
+        returning a dict mapping each word found to its page in Wikitext markup language.
+        The search is case sensitive.
 
+        Each request asks for up to WIKTI_API_MAX_TITLES pages,
+        so a list of words costs far less round trips than one request per word.
+        Up to concurrency requests are in flight at the same time:
+        Wikimedia asks API clients to send requests in series, that is the default.
 
-if __name__ == '__main__':
-    print('Show performance results searching the first and last words in Wiktionary pages dump')
-    ds = WiktiDs()
-    # Get the first and last words in index file
-    first_line = ''
-    last_line = ''
-    with open(ds.wiktionary_index_path, 'r', encoding='utf-8') as index_file:
-        for line in index_file:
-            if len(first_line) == 0:
-                first_line = line
-            last_line = line
-    first_word = first_line.rstrip().split(',')[0]
-    last_word = last_line.rstrip().split(',')[0]
-
-    print(f'Get first word "{first_word}" wikitext:')  # 0.001001119613647461 s
-    time_start = time()
-    wikitext = ds.get_wikitext(first_word)
-    time_elapsed = time() - time_start
-    if wikitext:
-        print(f'\tTime: {time_elapsed} s')
-    else:
-        print('\tNot found!')
+        See: https://www.mediawiki.org/wiki/API:Revisions
+        See: https://www.mediawiki.org/wiki/API:Etiquette
+        """
+        search_words = list(search_words)
+        # Create the session before the worker threads,
+        # which would otherwise race to create one each.
+        session = self.session
+        if concurrency > requests.adapters.DEFAULT_POOLSIZE:
+            # keep a pooled connection for each request in flight
+            session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+        titles_batches = [search_words[first:first + WiktiDs.WIKTI_API_MAX_TITLES]
+                          for first in range(0, len(search_words), WiktiDs.WIKTI_API_MAX_TITLES)]
+        wikitexts = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for batch_wikitexts in executor.map(self.query_wikitexts, titles_batches):
+                wikitexts.update(batch_wikitexts)
+        return wikitexts
+
+    def query_wikitexts(self, titles):
+        """Send a MediaWiki Action API query for the given titles,
+        returning a dict mapping each title found to its page in Wikitext markup language.
+
+        When the contents of all the pages exceed the API result size limit,
+        the response holds part of them and a `continue` object:
+        the query is sent again with it until the batch is complete.
+        When the server answers that it is busy and tells how long to wait (Retry-After),
+        the request is sent again after that time.
+        An API error response raises RuntimeError, API warnings are printed on stderr.
+
+        See: https://www.mediawiki.org/wiki/API:Continue
+        See: https://www.mediawiki.org/wiki/API:Errors_and_warnings
+        """
+        # Action API request claiming output data in JSON format
+        req_params = {
+            "action": "query",
+            "prop": "revisions",
+            "rvprop": "content",
+            "rvslots": "main",
+            "titles": "|".join(titles),
+            "format": "json",
+            "formatversion": "2",  # modern JSON format
+        }
+        # The API returns normalized titles: map them back to the search words,
+        # more than one search word may have the same normalized title
+        title_words = {title: [title] for title in titles}
+        wikitexts = {}
+        continue_params = {}
+        while True:
+            response = self.query_api({**req_params, **continue_params})
+            if "error" in response:
+                error = response["error"]
+                raise RuntimeError(f'MediaWiki API error {error.get("code")}: {error.get("info")}')
+            if "warnings" in response:
+                print(f'MediaWiki API warnings: {response["warnings"]}', file=sys.stderr)
+            self.add_query_wikitexts(response.get("query", {}), title_words, wikitexts)
+            if "continue" not in response:
+                # batch complete
+                return wikitexts
+            continue_params = response["continue"]
+
+    def query_api(self, req_params):
+        """Send a MediaWiki Action API request, returning its deserialized JSON data.
+
+        When the server answers that it is busy and tells how long to wait (Retry-After),
+        the request is sent again after that time.
+        """
+        for _ in range(WEB_REQUEST_MAX_RETRIES + 1):
+            query_result = self.session.get(WiktiDs.WIKTI_API_URL, params=req_params, timeout=WEB_REQUEST_TIMEOUT)
+            retry_after = query_result.headers.get('Retry-After', '')
+            if query_result.status_code not in (429, 503) or not retry_after.isdigit():
+                break
+            sleep(int(retry_after))
+        # Deserialize JSON data:
+        return query_result.json()
 
-    print(f'Get last word "{last_word}" wikitext:')  # 0.42599916458129883 s
+    @staticmethod
+    def add_query_wikitexts(query, title_words, wikitexts):
+        """Add to the wikitexts dict the pages of the query module result,
+        each one under the search words of its title in title_words.
+        """
+        # Action API returns the following JSON data:
+        # response = {
+        #     "continue": {"rvcontinue": <CONTINUE>, "continue": "||"},  # only if not complete
+        #     "query": {
+        #         "normalized": [{"from": "search_word", "to": "title"}],
+        #         "pages": [
+        #             {
+        #                 "pageid": <PAGE_ID>,
+        #                 "title": "title",
+        #                 "revisions": [{"slots": {"main": {"content": <wiki_markup>}}}]
+        #             },
+        #             {"title": "not_found_word", "missing": true},
+        #             {"pageid": <PAGE_ID>, "title": "title_to_continue"}
+        #         ]
+        #     }
+        # }
+        for normalized in query.get("normalized", ()):
+            search_words = title_words.setdefault(normalized["to"], [])
+            if normalized["from"] not in search_words:
+                search_words.append(normalized["from"])
+        for page in query.get("pages", ()):
+            if page.get("missing") or page.get("invalid"):
+                # search word not found
+                continue
+            if "revisions" not in page:
+                # content left to a continuation request
+                continue
+            wikitext = page["revisions"][0]["slots"]["main"]["content"]
+            for search_word in title_words.get(page["title"], (page["title"],)):
+                wikitexts[search_word] = wikitext
+
+
+def show_get_wikitext_time(ds, search_word):
+    """Print the time taken by the Data Store ds to get the search_word wikitext"""
     time_start = time()
-    wikitext = ds.get_wikitext(last_word)
+    wikitext = ds.get_wikitext(search_word)
     time_elapsed = time() - time_start
     if wikitext:
         print(f'\tTime: {time_elapsed} s')
     else:
         print('\tNot found!')
 
+
+if __name__ == '__main__':
+    print('Show performance results searching the first and last lemmas of the index')
+    ds = WiktiDs()
+    # Get the first and last lemmas of the index,
+    # which keeps the lemmas in sorted order
+    first_word = next(iter(ds.wikti_index))
+    last_word = next(reversed(ds.wikti_index))
+
+    print(f'Get first lemma "{first_word}" wikitext:')
+    show_get_wikitext_time(ds, first_word)
+
+    print(f'Get last lemma "{last_word}" wikitext:')
+    show_get_wikitext_time(ds, last_word)
+
     print('Show performance results searching online')
     online_wiktionary = WiktiDs(True)
 
-    print(f'Get first word "{first_word}" wikitext on line:')  # 0.49244213104248047 s
-    time_start = time()
-    wikitext = online_wiktionary.get_wikitext(first_word)
-    time_elapsed = time() - time_start
-    if wikitext:
-        print(f'\tTime: {time_elapsed} s')
-    else:
-        print('\tNot found!')
+    print(f'Get first lemma "{first_word}" wikitext on line:')  # 0.49244213104248047 s
+    show_get_wikitext_time(online_wiktionary, first_word)
 
-    print(f'Get last word "{last_word}" wikitext on line:')  # 0.41349339485168457 s
-    time_start = time()
-    wikitext = online_wiktionary.get_wikitext(last_word)
-    time_elapsed = time() - time_start
-    if wikitext:
-        print(f'\tTime: {time_elapsed} s')
-    else:
-        print('\tNot found!')
+    print(f'Get last lemma "{last_word}" wikitext on line:')  # 0.41349339485168457 s
+    show_get_wikitext_time(online_wiktionary, last_word)